@@ -2,11 +2,12 @@ from fastapi import FastAPI, APIRouter, HTTPException
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import AwareDatetime, BaseModel, Field, ConfigDict
+from typing import Dict, List, Literal, Optional, Set
 import uuid
 from datetime import datetime, timezone
 import smtplib
@@ -69,6 +70,67 @@ class Booking(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Booking status state machine: maps each status to the statuses it may move to
+BookingStatus = Literal["pending", "confirmed", "completed", "cancelled"]
+
+BOOKING_STATUS_TRANSITIONS: Dict[str, Set[str]] = {
+    "pending": {"confirmed", "cancelled"},
+    "confirmed": {"completed", "cancelled"},
+    "completed": set(),
+    "cancelled": set(),
+}
+
+def allowed_previous_statuses(new_status: str) -> List[str]:
+    return [
+        status for status, targets in BOOKING_STATUS_TRANSITIONS.items()
+        if new_status in targets
+    ]
+
+class BookingStatusUpdate(BaseModel):
+    status: BookingStatus
+    # updated_at the client last saw; the update is rejected if the booking changed since
+    expected_updated_at: Optional[AwareDatetime] = None
+
+class BulkBookingStatusItem(BookingStatusUpdate):
+    booking_id: str
+
+class BulkBookingStatusUpdate(BaseModel):
+    updates: List[BulkBookingStatusItem] = Field(min_length=1, max_length=1000)
+
+STATUS_HISTORY_LIMIT = 20
+
+def format_updated_at(value: datetime) -> str:
+    # Stored in UTC at millisecond precision so clients (e.g. JS Date) can echo it back exactly
+    return value.astimezone(timezone.utc).isoformat(timespec='milliseconds')
+
+def build_status_filter(booking_id: str, update: BookingStatusUpdate) -> dict:
+    query = {
+        "booking_id": booking_id,
+        "status": {"$in": allowed_previous_statuses(update.status)},
+    }
+    if update.expected_updated_at is not None:
+        expected = update.expected_updated_at.astimezone(timezone.utc)
+        # Bookings written before millisecond storage keep full-precision timestamps
+        query["updated_at"] = {"$in": list({format_updated_at(expected), expected.isoformat()})}
+    return query
+
+def build_status_change(status: str, updated_at: str, batch_id: Optional[str] = None) -> dict:
+    entry = {"status": status, "updated_at": updated_at}
+    if batch_id is not None:
+        entry["batch_id"] = batch_id
+    return {
+        "$set": {"status": status, "updated_at": updated_at},
+        "$push": {"status_history": {"$each": [entry], "$slice": -STATUS_HISTORY_LIMIT}},
+    }
+
+def describe_status_failure(current: Optional[dict], update: BookingStatusUpdate):
+    """Explain why a conditional status update matched nothing."""
+    if current is None:
+        return 404, "Booking not found"
+    if update.status not in BOOKING_STATUS_TRANSITIONS.get(current.get('status'), set()):
+        return 409, f"Cannot change status from {current.get('status')} to {update.status}"
+    return 409, "Booking was modified by another request"
+
 # Email sending function
 async def send_booking_email(booking: Booking):
     try:
@@ -215,7 +277,7 @@ async def create_booking(booking_data: BookingCreate):
         # Convert to dict and serialize datetime to ISO string for MongoDB
         doc = booking.model_dump()
         doc['created_at'] = doc['created_at'].isoformat()
-        doc['updated_at'] = doc['updated_at'].isoformat()
+        doc['updated_at'] = format_updated_at(doc['updated_at'])
         
         # Insert into database
         result = await db.bookings.insert_one(doc)
@@ -257,6 +319,88 @@ async def get_bookings():
         logger.error(f"Error fetching bookings: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.patch("/bookings/status")
+async def bulk_update_booking_status(payload: BulkBookingStatusUpdate):
+    booking_ids = [item.booking_id for item in payload.updates]
+    if len(set(booking_ids)) != len(booking_ids):
+        raise HTTPException(status_code=400, detail="Duplicate booking_id in updates")
+    
+    try:
+        # Applied rows are tagged in status_history, which later writers append to but never overwrite
+        batch_id = str(uuid.uuid4())
+        now = format_updated_at(datetime.now(timezone.utc))
+        operations = [
+            UpdateOne(
+                build_status_filter(item.booking_id, item),
+                build_status_change(item.status, now, batch_id)
+            )
+            for item in payload.updates
+        ]
+        result = await db.bookings.bulk_write(operations, ordered=False)
+        
+        if result.modified_count == len(operations):
+            return {"success": True, "updated": booking_ids, "failed": []}
+        
+        # Some conditions did not match: look up current state once to report why
+        current_docs = await db.bookings.find(
+            {"booking_id": {"$in": booking_ids}},
+            {"_id": 0, "booking_id": 1, "status": 1, "updated_at": 1, "status_history.batch_id": 1}
+        ).to_list(len(booking_ids))
+        current_by_id = {doc['booking_id']: doc for doc in current_docs}
+        
+        updated = []
+        failed = []
+        for item in payload.updates:
+            current = current_by_id.get(item.booking_id)
+            history = current.get('status_history', []) if current else []
+            if any(entry.get('batch_id') == batch_id for entry in history):
+                updated.append(item.booking_id)
+            else:
+                status_code, reason = describe_status_failure(current, item)
+                failed.append({
+                    "booking_id": item.booking_id,
+                    "status_code": status_code,
+                    "reason": reason
+                })
+        
+        logger.info(f"Bulk status update: {len(updated)} updated, {len(failed)} failed")
+        return {"success": not failed, "updated": updated, "failed": failed}
+        
+    except Exception as e:
+        logger.error(f"Error updating booking statuses: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.patch("/bookings/{booking_id}/status")
+async def update_booking_status(booking_id: str, update: BookingStatusUpdate):
+    try:
+        booking = await db.bookings.find_one_and_update(
+            build_status_filter(booking_id, update),
+            build_status_change(update.status, format_updated_at(datetime.now(timezone.utc))),
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        
+        if booking is None:
+            current = await db.bookings.find_one(
+                {"booking_id": booking_id},
+                {"_id": 0, "status": 1, "updated_at": 1}
+            )
+            status_code, reason = describe_status_failure(current, update)
+            raise HTTPException(status_code=status_code, detail=reason)
+        
+        for field in ('created_at', 'updated_at'):
+            if isinstance(booking.get(field), str):
+                booking[field] = datetime.fromisoformat(booking[field])
+        
+        logger.info(f"Booking {booking_id} status changed to {update.status}")
+        return {"success": True, "booking": booking}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating booking status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -275,6 +419,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Status updates filter on booking_id, single and in bulk
+    await db.bookings.create_index("booking_id")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
\ No newline at end of file
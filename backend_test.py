@@ -7,7 +7,7 @@ Tests all backend endpoints and functionality
 import requests
 import json
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 
@@ -282,6 +282,176 @@ class BookingAPITester:
         except Exception as e:
             self.log_result("Email Notification", False, f"Error: {str(e)}")
     
+    def test_update_booking_status(self, booking_id):
+        """Test PATCH /api/bookings/{booking_id}/status transitions and concurrency"""
+        if not booking_id:
+            self.log_result("Update Booking Status", False, "No booking_id to update")
+            return
+        
+        try:
+            # pending -> confirmed
+            response = requests.patch(
+                f"{API_BASE}/bookings/{booking_id}/status",
+                json={"status": "confirmed"},
+                timeout=10
+            )
+            if response.status_code == 200 and response.json().get('booking', {}).get('status') == 'confirmed':
+                self.log_result("Update Booking Status (Confirm)", True, f"Booking ID: {booking_id}")
+            else:
+                self.log_result("Update Booking Status (Confirm)", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                return
+            
+            # confirmed -> confirmed is not a valid transition
+            response = requests.patch(
+                f"{API_BASE}/bookings/{booking_id}/status",
+                json={"status": "confirmed"},
+                timeout=10
+            )
+            if response.status_code == 409:
+                self.log_result("Update Booking Status (Invalid Transition)", True, 
+                              "Correctly rejected with status: 409")
+            else:
+                self.log_result("Update Booking Status (Invalid Transition)", False, 
+                              f"Should reject but got status: {response.status_code}")
+            
+            # Stale updated_at must not overwrite a newer change
+            response = requests.patch(
+                f"{API_BASE}/bookings/{booking_id}/status",
+                json={"status": "completed", "expected_updated_at": "2000-01-01T00:00:00+00:00"},
+                timeout=10
+            )
+            if response.status_code == 409:
+                self.log_result("Update Booking Status (Stale Version)", True, 
+                              "Correctly rejected with status: 409")
+            else:
+                self.log_result("Update Booking Status (Stale Version)", False, 
+                              f"Should reject but got status: {response.status_code}")
+            
+            # Unknown booking
+            response = requests.patch(
+                f"{API_BASE}/bookings/does-not-exist/status",
+                json={"status": "confirmed"},
+                timeout=10
+            )
+            if response.status_code == 404:
+                self.log_result("Update Booking Status (Not Found)", True, 
+                              "Correctly rejected with status: 404")
+            else:
+                self.log_result("Update Booking Status (Not Found)", False, 
+                              f"Should reject but got status: {response.status_code}")
+                
+        except Exception as e:
+            self.log_result("Update Booking Status", False, f"Error: {str(e)}")
+    
+    def create_status_test_booking(self, name):
+        """Create a minimal booking for status update tests"""
+        booking_data = {
+            "name": name,
+            "phone": "+91-9000011111",
+            "service_type": "airport-pickup",
+            "pickup_location": "Bagdogra Airport (IXB)",
+            "drop_location": "Siliguri City Center",
+            "date": (datetime.now() + timedelta(days=4)).strftime("%Y-%m-%d")
+        }
+        response = requests.post(f"{API_BASE}/bookings", json=booking_data, timeout=15)
+        return response.json().get('booking_id') if response.status_code == 200 else None
+    
+    def confirm_and_get_updated_at(self, booking_id):
+        """Confirm a booking and return the updated_at from the response"""
+        response = requests.patch(
+            f"{API_BASE}/bookings/{booking_id}/status",
+            json={"status": "confirmed"},
+            timeout=10
+        )
+        if response.status_code != 200:
+            return None
+        return response.json().get('booking', {}).get('updated_at')
+    
+    def test_update_booking_status_concurrency(self):
+        """Test that a fresh expected_updated_at is accepted, in any time zone"""
+        
+        # Test 1: Echo back updated_at exactly as returned
+        try:
+            booking_id = self.create_status_test_booking("Concurrency Test User")
+            updated_at = self.confirm_and_get_updated_at(booking_id) if booking_id else None
+            if not updated_at:
+                self.log_result("Update Booking Status (Current Version)", False, 
+                              "Could not create and confirm booking")
+            else:
+                response = requests.patch(
+                    f"{API_BASE}/bookings/{booking_id}/status",
+                    json={"status": "completed", "expected_updated_at": updated_at},
+                    timeout=10
+                )
+                if response.status_code == 200:
+                    self.log_result("Update Booking Status (Current Version)", True, 
+                                  f"Accepted expected_updated_at: {updated_at}")
+                else:
+                    self.log_result("Update Booking Status (Current Version)", False, 
+                                  f"Status: {response.status_code}, Response: {response.text}")
+                    
+        except Exception as e:
+            self.log_result("Update Booking Status (Current Version)", False, f"Error: {str(e)}")
+        
+        # Test 2: Same instant expressed in IST (+05:30)
+        try:
+            booking_id = self.create_status_test_booking("Timezone Test User")
+            updated_at = self.confirm_and_get_updated_at(booking_id) if booking_id else None
+            if not updated_at:
+                self.log_result("Update Booking Status (IST Offset)", False, 
+                              "Could not create and confirm booking")
+            else:
+                ist = timezone(timedelta(hours=5, minutes=30))
+                updated_at_ist = datetime.fromisoformat(updated_at).astimezone(ist).isoformat()
+                response = requests.patch(
+                    f"{API_BASE}/bookings/{booking_id}/status",
+                    json={"status": "completed", "expected_updated_at": updated_at_ist},
+                    timeout=10
+                )
+                if response.status_code == 200:
+                    self.log_result("Update Booking Status (IST Offset)", True, 
+                                  f"Accepted expected_updated_at: {updated_at_ist}")
+                else:
+                    self.log_result("Update Booking Status (IST Offset)", False, 
+                                  f"Status: {response.status_code}, Response: {response.text}")
+                    
+        except Exception as e:
+            self.log_result("Update Booking Status (IST Offset)", False, f"Error: {str(e)}")
+    
+    def test_bulk_update_booking_status(self, booking_ids):
+        """Test PATCH /api/bookings/status with mixed valid and invalid updates"""
+        booking_ids = [booking_id for booking_id in booking_ids if booking_id]
+        if not booking_ids:
+            self.log_result("Bulk Update Booking Status", False, "No booking_ids to update")
+            return
+        
+        updates = [{"booking_id": booking_id, "status": "cancelled"} for booking_id in booking_ids]
+        updates.append({"booking_id": "does-not-exist", "status": "cancelled"})
+        
+        try:
+            response = requests.patch(
+                f"{API_BASE}/bookings/status",
+                json={"updates": updates},
+                timeout=15
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                failed_ids = [item.get('booking_id') for item in data.get('failed', [])]
+                if set(data.get('updated', [])) == set(booking_ids) and failed_ids == ["does-not-exist"]:
+                    self.log_result("Bulk Update Booking Status", True, 
+                                  f"Updated {len(data.get('updated'))}, failed {len(failed_ids)}")
+                else:
+                    self.log_result("Bulk Update Booking Status", False, 
+                                  f"Unexpected response: {data}")
+            else:
+                self.log_result("Bulk Update Booking Status", False, 
+                              f"Status: {response.status_code}, Response: {response.text}")
+                
+        except Exception as e:
+            self.log_result("Bulk Update Booking Status", False, f"Error: {str(e)}")
+    
     def check_backend_logs(self):
         """Check backend supervisor logs for email confirmation"""
         try:
@@ -335,9 +505,20 @@ class BookingAPITester:
         # Test 5: Get bookings
         self.test_get_bookings()
         
+        print("\n🔄 Testing Booking Status Updates...")
+        
+        # Test 6: Single status transitions
+        self.test_update_booking_status(booking_id1)
+        
+        # Test 7: Optimistic concurrency with a current updated_at
+        self.test_update_booking_status_concurrency()
+        
+        # Test 8: Bulk status transitions
+        self.test_bulk_update_booking_status([booking_id1, booking_id2])
+        
         print("\n📧 Testing Email Notifications...")
         
-        # Test 6: Email functionality
+        # Test 9: Email functionality
         self.test_email_functionality()
         
         return self.get_summary()